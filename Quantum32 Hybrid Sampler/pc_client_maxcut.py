@@ -36,6 +36,7 @@ DEPENDENCIAS:
     - numpy
     - matplotlib
     - networkx (opcional, para visualización del grafo)
+    - numba (opcional, compila el scoring de grafos "custom")
 
 AUTOR: Alejandro Rebolledo (arebolledo@udd.cl)
 LICENCIA: CC BY-NC 4.0
@@ -45,6 +46,8 @@ LICENCIA: CC BY-NC 4.0
 import time
 import sys
 import os
+import re
+import select
 from datetime import datetime
 import numpy as np
 
@@ -69,6 +72,12 @@ except ImportError:
     NETWORKX_OK = False
     print("WARNING: networkx not available. Graph visualization will be skipped.")
 
+try:
+    from numba import njit
+    NUMBA_OK = True
+except ImportError:
+    NUMBA_OK = False  # custom graphs fall back to the generated Python scorer
+
 
 # -------------------------
 # USER SETTINGS (EDIT HERE)
@@ -97,27 +106,79 @@ RING_WEIGHT = 1.0
 
 # Runtime
 READ_TIMEOUT_S = 25      # stop if no data for N seconds
+TICK_RING = 64           # in-flight ticks kept while waiting for all slaves
 PRINT_STATUS_LINES = True
+PRINT_DATA_LINES = False # echo every O-line (debug only, slows the receive loop)
 
 
 # -------------------------
 # HELPERS
 # -------------------------
+# O,<tick>,<slaveIndex>,<bmask>,<loss>,<noise>,<seed> -- scoring only needs the first three fields
+O_LINE_RE = re.compile(rb"O,(\d+),(\d+),(\d+),")
+
 def clamp_int(x, lo, hi):
     return max(lo, min(hi, int(x)))
 
 def clamp_float(x, lo, hi):
     return max(lo, min(hi, float(x)))
 
-def bits_from_bmask(bmask: int, width: int = 4):
-    return np.array([(bmask >> i) & 1 for i in range(width)], dtype=np.int8)
+def make_bmask_lut(width: int = 4):
+    # LUT[bmask] -> bits of that bmask, LSB first
+    return np.array([[(m >> i) & 1 for i in range(width)] for m in range(1 << width)], dtype=np.int8)
 
-def maxcut_score(bits: np.ndarray, edges):
-    score = 0.0
+BMASK_LUT = make_bmask_lut(BITS_PER_SLAVE)
+
+def unpack_into(buf: np.ndarray, bmasks, width: int = 4):
+    # Write each slave's LUT row straight into its slice of buf (no concatenate)
+    for s, bm in enumerate(bmasks):
+        buf[s * width:(s + 1) * width] = BMASK_LUT[bm]
+    return buf
+
+def make_score_fn(edges):
+    # Generate a straight-line scorer over the packed sample, e.g.
+    # "((x >> 0 ^ x >> 1) & 1) + ((x >> 1 ^ x >> 2) & 1) + ..." (no loops, no numpy)
+    terms = []
     for (i, j, w) in edges:
-        if bits[i] != bits[j]:
-            score += w
-    return score
+        term = f"((x >> {int(i)} ^ x >> {int(j)}) & 1)"
+        terms.append(term if w == 1 else f"{term} * {float(w)!r}")
+    src = "def score_fn(x):\n    return " + (" + ".join(terms) or "0") + "\n"
+    ns = {}
+    exec(src, ns)
+    return ns["score_fn"]
+
+if NUMBA_OK:
+    @njit(cache=True)
+    def process_tick(bmasks, I, J, W, bits, width):
+        # Expand the packed slave bmasks into bits and score them in one compiled pass
+        for k in range(bits.shape[0]):
+            bits[k] = (bmasks[k // width] >> (k % width)) & 1
+        score = 0.0
+        for e in range(I.shape[0]):
+            if bits[I[e]] != bits[J[e]]:
+                score += W[e]
+        return score
+
+def pack_bmasks(bmasks, width: int = 4):
+    # Slave s owns bits [s*width, (s+1)*width) of the packed sample
+    full = 0
+    for s, bm in enumerate(bmasks):
+        full |= bm << (s * width)
+    return full
+
+def ring_cut(full: int, n: int):
+    # On a ring, cut edges are the bits that differ from their rotated neighbour
+    x = full ^ (((full << 1) | (full >> (n - 1))) & ((1 << n) - 1))
+    return x.bit_count()
+
+def read_available(ser, timeout=0.1):
+    # Block until the port is readable (or `timeout`), then take everything pending in one read.
+    # POSIX ports can be select()ed; on Windows the port's own read timeout does the waiting.
+    if os.name != "nt":
+        ready, _, _ = select.select([ser], [], [], timeout)
+        if not ready:
+            return b""
+    return ser.read(ser.in_waiting or 1)
 
 def make_ring_edges(n, w=1.0):
     return [(i, (i + 1) % n, float(w)) for i in range(n)]
@@ -130,6 +191,13 @@ def build_edges(n_bits):
     # return [(0, 1, 1.0), (1, 2, 2.0), ...]
     return make_ring_edges(n_bits, RING_WEIGHT)
 
+def edges_to_arrays(edges):
+    # Struct-of-arrays view of the edge list for the compiled scorer
+    edges_I = np.fromiter((e[0] for e in edges), dtype=np.int32, count=len(edges))
+    edges_J = np.fromiter((e[1] for e in edges), dtype=np.int32, count=len(edges))
+    edges_W = np.asarray([e[2] for e in edges], dtype=np.float32)
+    return edges_I, edges_J, edges_W
+
 def parse_kv_from_batch_header(line: str):
     # line format: "@BATCH RUN=.. TICK0=.. K=.. ..."
     out = {}
@@ -161,6 +229,7 @@ def main():
     global SERIAL_PORT, BAUD_RATE, NUM_SLAVES, BITS_PER_SLAVE
     global PARAM_T, PARAM_B, PARAM_KP, PARAM_M
     global BATCH_K, BATCH_STRIDE, BATCH_BURN
+    global BMASK_LUT
 
     if serial is None:
         return
@@ -191,7 +260,11 @@ def main():
     BATCH_BURN = clamp_int(BATCH_BURN, 0, 5000)
 
     n_bits = NUM_SLAVES * BITS_PER_SLAVE
+    BMASK_LUT = make_bmask_lut(BITS_PER_SLAVE)
     edges = build_edges(n_bits)
+    edges_I, edges_J, edges_W = edges_to_arrays(edges)
+    score_fn = make_score_fn(edges)
+    bits_buf = np.empty(n_bits, dtype=np.int8)
 
     print("\n--- CONFIG ---")
     print("PORT:", SERIAL_PORT)
@@ -212,19 +285,19 @@ def main():
         print("Tip: close Arduino Serial Monitor / other apps using the port.")
         return
 
-    def send(cmd: str):
-        ser.write((cmd.strip() + "\n").encode("utf-8"))
+    def send(*cmds: str):
+        # One write for all commands: the Master buffers its UART and parses line by line
+        ser.write("".join(cmd.strip() + "\n" for cmd in cmds).encode("utf-8"))
 
     # Handshake and start
-    send("@HELLO")
-    time.sleep(0.05)
     # MasterV3 uses N for Noise, and @PARAM to broadcast everything
-    send(f"@PARAM N={PARAM_T:.2f} B={PARAM_B} K={PARAM_KP} M={PARAM_M}")
-    time.sleep(0.05)
-    send(f"@GET K={BATCH_K} STRIDE={BATCH_STRIDE} BURN={BATCH_BURN}")
+    send("@HELLO",
+         f"@PARAM N={PARAM_T:.2f} B={PARAM_B} K={PARAM_KP} M={PARAM_M}",
+         f"@GET K={BATCH_K} STRIDE={BATCH_STRIDE} BURN={BATCH_BURN}")
 
     best_score = -1e18
     best_bits = None
+    best_full = None       # packed bits of the best sample
     best_tick = None
 
     last_rx_time = time.time()
@@ -232,94 +305,102 @@ def main():
 
     # Data collection for reports
     all_scores = []        # All scores calculated
-    all_samples = []       # All samples: {'tick', 'score', 'bits'}
+    all_samples = []       # All samples: (tick, score, packed bits); bitstrings are built on export
     best_history = []      # (tick, best_score_so_far) for evolution plot
 
-    # We collect per-tick lines (one per slave) then score when a tick is complete
-    tick_buffer = {}  # tick -> dict(slaveIndex -> (bmask, loss, noise, seed))
+    # We collect per-tick lines (one per slave) then score when a tick is complete.
+    # Fixed ring indexed by tick % TICK_RING: one row of slave bmasks per tick.
+    tb_bmask = np.zeros((TICK_RING, NUM_SLAVES), dtype=np.uint16)
+    tb_seen = np.zeros(TICK_RING, dtype=np.uint32)     # bit s set once slave s reported
+    tb_tick = np.full(TICK_RING, -1, dtype=np.int64)
+    all_seen = (1 << NUM_SLAVES) - 1
+
+    rxbuf = bytearray()   # bytes received but not yet terminated by a newline
+    done = False
 
     print("Listening... (Ctrl+C to stop)\n")
 
     try:
-        while True:
-            line = ser.readline().decode("utf-8", errors="ignore").strip()
+        while not done:
+            # Wait for data without spinning, then read everything pending in one call
+            rxbuf += read_available(ser)
+            *lines, rxbuf = rxbuf.split(b"\n")
+
+            for raw in lines:
+                if raw.startswith(b"O,"):
+                    # Matched straight from bytes: int() accepts ASCII digits, no decode needed
+                    last_rx_time = time.time()
+                    if PRINT_DATA_LINES:
+                        print(f"[DATA] {raw.decode('ascii', errors='ignore').strip()}")
+                    m = O_LINE_RE.match(raw)
+                    if m is None:
+                        continue
 
-            if line:
-                last_rx_time = time.time()
+                    tick = int(m[1])
+                    sidx = int(m[2])
+                    bmask = int(m[3]) & ((1 << BITS_PER_SLAVE) - 1)
+
+                    if not 0 <= sidx < NUM_SLAVES:
+                        continue
 
-                if line.startswith("@BATCH"):
-                    batch_meta = parse_kv_from_batch_header(line)
-                    print(f"[META] {batch_meta}")
+                    slot = tick % TICK_RING
+                    if tb_tick[slot] != tick:
+                        tb_tick[slot] = tick
+                        tb_seen[slot] = 0
+                    tb_bmask[slot, sidx] = bmask
+                    tb_seen[slot] |= 1 << sidx
+
+                    if tb_seen[slot] == all_seen:
+                        # pack the full sample ordered by slave index
+                        bmasks = tb_bmask[slot].tolist()
+                        full = pack_bmasks(bmasks, BITS_PER_SLAVE)
+                        if GRAPH_TYPE == "ring":
+                            score = RING_WEIGHT * ring_cut(full, n_bits)
+                        elif NUMBA_OK:
+                            score = process_tick(tb_bmask[slot], edges_I, edges_J, edges_W,
+                                                 bits_buf, BITS_PER_SLAVE)
+                        else:
+                            score = float(score_fn(full))
+                        
+                        # Store for later analysis
+                        all_scores.append(score)
+                        all_samples.append((tick, score, full))
+                        
+                        # Track best score evolution
+                        if score > best_score:
+                            best_score = score
+                            best_bits = unpack_into(bits_buf, bmasks, BITS_PER_SLAVE).copy()
+                            best_full = full
+                            bitstr = format(full, f"0{n_bits}b")[::-1]
+                            best_tick = tick
+                            print(f"\n[BEST] tick={best_tick} score={best_score:.2f} bits={bitstr}")
+                        
+                        best_history.append((tick, best_score))
+                        
+                        # UX: Progress indicator, once per completed tick (dot every 10, count every 50)
+                        if tick % 10 == 0:
+                            sys.stdout.write(f" [{tick}/{BATCH_K}]" if tick % 50 == 0 else ".")
+                            sys.stdout.flush()
                     continue
 
-                if line.startswith("@DONE"):
-                    print(f"[DONE] {line}")
-                    break
-
-                # Print everything else to see what's happening
-                if not line.startswith("O,") and not line.startswith("@"):
-                    print(f"[MSG] {line}")
-                
-                if line.startswith("O,"):
-                    # O,<tick>,<slaveIndex>,<bmask>,<loss>,<noise>,<seed>
-                    print(f"[DATA] {line}") # DEBUG: Verify data flow
-                    parts = line.split(",")
-                    if len(parts) < 7:
-                        continue
+                line = raw.decode("utf-8", errors="ignore").strip()
+
+                if line:
+                    last_rx_time = time.time()
 
-                    try:
-                        tick = int(parts[1])
-                        sidx = int(parts[2])
-                        bmask = int(parts[3])
-                        loss = int(parts[4])
-                        noise = float(parts[5])
-                        seed = int(parts[6])
-                    except Exception:
+                    if line.startswith("@BATCH"):
+                        batch_meta = parse_kv_from_batch_header(line)
+                        print(f"[META] {batch_meta}")
                         continue
 
-                    if tick not in tick_buffer:
-                        tick_buffer[tick] = {}
-
-                    tick_buffer[tick][sidx] = (bmask, loss, noise, seed)
-
-                    # UX: Progress indicator (dot every 10 lines received)
-                    if tick % 10 == 0:
-                        print(".", end="", flush=True)
-
-                    if len(tick_buffer[tick]) >= NUM_SLAVES:
-                        # build full vector ordered by slave index
-                        vec = []
-                        for s in range(NUM_SLAVES):
-                            if s not in tick_buffer[tick]:
-                                break
-                            bm, *_rest = tick_buffer[tick][s]
-                            vec.append(bits_from_bmask(bm, width=BITS_PER_SLAVE))
-                        if len(vec) == NUM_SLAVES:
-                            bits = np.concatenate(vec)
-                            score = maxcut_score(bits, edges)
-                            bitstr = "".join(str(int(x)) for x in bits.tolist())
-                            
-                            # Store for later analysis
-                            all_scores.append(score)
-                            all_samples.append({'tick': tick, 'score': score, 'bits': bitstr})
-                            
-                            # Track best score evolution
-                            if score > best_score:
-                                best_score = score
-                                best_bits = bits.copy()
-                                best_tick = tick
-                                print(f"\n[BEST] tick={best_tick} score={best_score:.2f} bits={bitstr}")
-                            
-                            best_history.append((tick, best_score))
-                            
-                            # UX: Progress indicator
-                            if tick % 50 == 0:
-                                print(f" [{tick}/{BATCH_K}]", end="", flush=True)
-                                
-                        # cleanup old ticks to keep memory bounded
-                        if len(tick_buffer) > 50:
-                            for old in sorted(tick_buffer.keys())[:-20]:
-                                tick_buffer.pop(old, None)
+                    if line.startswith("@DONE"):
+                        print(f"[DONE] {line}")
+                        done = True
+                        break
+
+                    # Print everything else to see what's happening
+                    if not line.startswith("@"):
+                        print(f"[MSG] {line}")
 
             # Timeout handling
             if (time.time() - last_rx_time) > READ_TIMEOUT_S:
@@ -363,9 +444,10 @@ def main():
         try:
             with open(csv_path, 'w') as f:
                 f.write("tick,score,bits,is_best\n")
-                for sample in all_samples:
-                    is_best = 1 if (best_bits is not None and sample['bits'] == ''.join(str(int(x)) for x in best_bits.tolist())) else 0
-                    f.write(f"{sample['tick']},{sample['score']},{sample['bits']},{is_best}\n")
+                bits_fmt = f"0{n_bits}b"
+                for s_tick, s_score, s_full in all_samples:
+                    is_best = 1 if s_full == best_full else 0
+                    f.write(f"{s_tick},{s_score},{format(s_full, bits_fmt)[::-1]},{is_best}\n")
             print(f"\n[CSV] Datos guardados en: {csv_path}")
         except Exception as e:
             print(f"[CSV] Error guardando CSV: {e}")
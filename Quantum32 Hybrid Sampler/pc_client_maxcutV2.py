@@ -18,6 +18,7 @@ CARACTERÍSTICAS:
 
 REQUERIMIENTOS:
     pip install pyserial numpy dearpygui
+    Opcional: pip install numba (compila el scoring de grafos "custom")
 
 AUTOR: Alejandro Rebolledo (arebolledo@udd.cl)
 LICENCIA: CC BY-NC 4.0
@@ -27,7 +28,11 @@ LICENCIA: CC BY-NC 4.0
 import time
 import sys
 import os
+import re
+import select
 import math
+import queue
+import threading
 from datetime import datetime
 from glob import glob
 import numpy as np
@@ -46,6 +51,13 @@ try:
 except ImportError:
     DEARPYGUI_OK = False
 
+# Numba (optional)
+try:
+    from numba import njit
+    NUMBA_OK = True
+except ImportError:
+    NUMBA_OK = False
+
 
 # =============================================================================
 # CONFIGURATION & CONSTANTS
@@ -54,10 +66,19 @@ DEFAULT_PORT = "COM16"
 BAUD_RATE = 115200
 NUM_SLAVES = 4
 BITS_PER_SLAVE = 4
+TICK_RING = 64  # in-flight ticks kept while waiting for all slaves
+ALL_SLAVES_SEEN = (1 << NUM_SLAVES) - 1
 
 # Max-Cut Problem Edges (Ring Graph)
 N_BITS = NUM_SLAVES * BITS_PER_SLAVE
 EDGES = [(i, (i + 1) % N_BITS, 1.0) for i in range(N_BITS)]
+# Derived, not configured: the popcount fast path only applies to the unit-weight ring
+GRAPH_TYPE = "ring" if EDGES == [(i, (i + 1) % N_BITS, 1.0) for i in range(N_BITS)] else "custom"
+EDGES_I = np.array([e[0] for e in EDGES], dtype=np.int32)
+EDGES_J = np.array([e[1] for e in EDGES], dtype=np.int32)
+EDGES_W = np.array([e[2] for e in EDGES], dtype=np.float32)
+MAX_SCORE = int(EDGES_W.sum())  # every edge cut
+SCORE_BINS = list(range(MAX_SCORE + 1))
 
 # Default Params
 PARAM_B = 5
@@ -66,18 +87,67 @@ PARAM_M = 1
 BATCH_STRIDE = 1
 BATCH_BURN = 50  # Increased for better thermalization
 
+# UI
+UI_REFRESH_S = 1 / 30  # min seconds between plot/graph refreshes
+EDGE_STYLE = (((50, 50, 50, 100), 1), ((255, 255, 255, 100), 2))  # (color, thickness) by is_cut
+NODE_FILL = ((255, 100, 100), (100, 255, 200))  # Group A (Reddish), Group B (Cyan/Greenish)
+NODE_OUTLINE = (255, 255, 255)
+NODE_LABEL = (0, 0, 0)
+
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
-def bits_from_bmask(bmask, width=4):
-    return np.array([(bmask >> i) & 1 for i in range(width)], dtype=np.int8)
+# O,<tick>,<slaveIndex>,<bmask>,<loss>,<noise>,<seed> -- scoring only needs the first three fields
+O_LINE_RE = re.compile(rb"O,(\d+),(\d+),(\d+),")
 
-def maxcut_score(bits, edges):
-    score = 0.0
+# LUT[bmask] -> bits of that bmask, LSB first
+BMASK_LUT = np.array([[(m >> i) & 1 for i in range(BITS_PER_SLAVE)]
+                      for m in range(1 << BITS_PER_SLAVE)], dtype=np.int8)
+
+def make_score_fn(edges):
+    # Generate a straight-line scorer over the packed sample, e.g.
+    # "((x >> 0 ^ x >> 1) & 1) + ((x >> 1 ^ x >> 2) & 1) + ..." (no loops, no numpy)
+    terms = []
     for (i, j, w) in edges:
-        if bits[i] != bits[j]:
-            score += w
-    return score
+        term = f"((x >> {int(i)} ^ x >> {int(j)}) & 1)"
+        terms.append(term if w == 1 else f"{term} * {float(w)!r}")
+    src = "def score_fn(x):\n    return " + (" + ".join(terms) or "0") + "\n"
+    ns = {}
+    exec(src, ns)
+    return ns["score_fn"]
+
+if NUMBA_OK:
+    @njit(cache=True)
+    def process_tick(bmasks, I, J, W, bits, width):
+        # Expand the packed slave bmasks into bits and score them in one compiled pass
+        for k in range(bits.shape[0]):
+            bits[k] = (bmasks[k // width] >> (k % width)) & 1
+        score = 0.0
+        for e in range(I.shape[0]):
+            if bits[I[e]] != bits[J[e]]:
+                score += W[e]
+        return score
+
+def pack_bmasks(bmasks, width=4):
+    # Slave s owns bits [s*width, (s+1)*width) of the packed sample
+    full = 0
+    for s, bm in enumerate(bmasks):
+        full |= bm << (s * width)
+    return full
+
+def ring_cut(full, n):
+    # On a ring, cut edges are the bits that differ from their rotated neighbour
+    x = full ^ (((full << 1) | (full >> (n - 1))) & ((1 << n) - 1))
+    return x.bit_count()
+
+def read_available(ser, timeout=0.1):
+    # Block until the port is readable (or `timeout`), then take everything pending in one read.
+    # POSIX ports can be select()ed; on Windows the port's own read timeout does the waiting.
+    if os.name != "nt":
+        ready, _, _ = select.select([ser], [], [], timeout)
+        if not ready:
+            return b""
+    return ser.read(ser.in_waiting or 1)
 
 def get_script_dir():
     return os.path.dirname(os.path.abspath(__file__))
@@ -85,6 +155,70 @@ def get_script_dir():
 def get_timestamp():
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
+# =============================================================================
+# BATCH ACCUMULATOR
+# =============================================================================
+class BatchAccumulator:
+    """Resultados de un batch: muestras, histograma de scores y mejor solución.
+    
+    Cada inicio de captura crea uno nuevo con su punto de parámetros (`label`),
+    así los batches de un barrido de T/annealing quedan separados y comparables.
+    """
+    def __init__(self, capacity=300, label=""):
+        self.label = label
+        self.score_counts = np.zeros(MAX_SCORE + 1, dtype=np.int32)  # histogram by integer score
+        self.best_history_x = []
+        self.best_history_y = []
+        self.best_score = 0
+        self.best_bits = None
+        self.sample_count = 0
+        # Samples as parallel arrays, filled by index up to sample_count
+        self.ticks = np.empty(capacity, dtype=np.int32)
+        self.scores = np.empty(capacity, dtype=np.int16)
+        self.bmasks = np.empty((capacity, NUM_SLAVES), dtype=np.uint16)
+
+    def reserve(self, extra):
+        """Grows the sample arrays to fit `extra` more samples, keeping the stored ones."""
+        n = self.sample_count
+        need = n + max(extra, 1)
+        if need <= len(self.ticks): return
+        ticks = np.empty(need, dtype=np.int32)
+        scores = np.empty(need, dtype=np.int16)
+        bmasks = np.empty((need, NUM_SLAVES), dtype=np.uint16)
+        ticks[:n] = self.ticks[:n]
+        scores[:n] = self.scores[:n]
+        bmasks[:n] = self.bmasks[:n]
+        self.ticks, self.scores, self.bmasks = ticks, scores, bmasks
+
+    def add(self, tick, score, bmask_row):
+        """Stores one completed sample. Returns True if it is a new best."""
+        n = self.sample_count
+        if n == len(self.ticks):
+            self.reserve(n)
+        self.ticks[n] = tick
+        self.scores[n] = score
+        self.bmasks[n] = bmask_row
+        self.sample_count += 1
+        self.score_counts[min(int(score), MAX_SCORE)] += 1
+        
+        is_best = score > self.best_score
+        if is_best:
+            self.best_score = score
+            self.best_bits = BMASK_LUT[bmask_row].ravel()
+        
+        self.best_history_x.append(tick)
+        self.best_history_y.append(self.best_score)
+        return is_best
+
+    def save_csv(self, path):
+        """Writes the stored samples as tick,score,bits."""
+        n = self.sample_count
+        # Expand all bmasks to '0'/'1' bytes in one pass and view each row as a bitstring
+        bits = BMASK_LUT[self.bmasks[:n]].reshape(n, N_BITS) + ord("0")
+        bitstrs = bits.astype(np.uint8).view(f"S{N_BITS}").ravel().astype(str)
+        rows = np.column_stack([self.ticks[:n].astype(str), self.scores[:n].astype(str), bitstrs])
+        np.savetxt(path, rows, fmt="%s", delimiter=",", header="tick,score,bits", comments="")
+
 # =============================================================================
 # DASHBOARD CLASS
 # =============================================================================
@@ -94,20 +228,31 @@ class QuantumDashboard:
         self.running = False
         
         # Data storage
-        self.all_scores = []
-        self.all_samples = []
-        self.best_history_x = []
-        self.best_history_y = []
-        self.best_score = 0
-        self.best_bits = None
-        self.sample_count = 0
-        self.tick_buffer = {}
+        self.acc = BatchAccumulator()
+        self.runs = []  # one BatchAccumulator per started batch / parameter point
+        # Tick ring indexed by tick % TICK_RING: one row of slave bmasks per tick
+        self.tb_bmask = np.zeros((TICK_RING, NUM_SLAVES), dtype=np.uint16)
+        self.tb_seen = np.zeros(TICK_RING, dtype=np.uint32)  # bit s set once slave s reported
+        self.tb_tick = np.full(TICK_RING, -1, dtype=np.int64)
+        self.bits_buf = np.empty(N_BITS, dtype=np.int8)
+        self._score_fn = make_score_fn(EDGES)
+        
+        # Serial reader thread -> UI thread
+        self._q = queue.SimpleQueue()
+        self._rx_stop = threading.Event()
+        self._rx_thr = None
         
         # UI State
         self.auto_start_requested = False
         self.anneal_active = False
+        self.t_start = 0.35
+        self.t_end = 0.05
+        self.t_slope = 0.0  # T change per sample
         self.last_sent_t = -1.0
         self.batch_k = 300
+        self._last_ui_ts = 0.0
+        self._last_ui_count = 0
+        self._graph_dirty = False
         
         # Graph constants
         self.graph_center = (150, 150)
@@ -119,6 +264,12 @@ class QuantumDashboard:
             x = self.graph_center[0] + self.graph_radius * math.cos(angle)
             y = self.graph_center[1] + self.graph_radius * math.sin(angle)
             self.node_positions.append((x, y))
+        # Edge endpoints and label anchors resolved once for draw_graph
+        self.node_positions_np = np.array(self.node_positions, dtype=np.float32)
+        self._edge_p1 = self.node_positions_np[EDGES_I].tolist()
+        self._edge_p2 = self.node_positions_np[EDGES_J].tolist()
+        self._label_pos = (self.node_positions_np - (4, 7)).tolist()
+        self._label_txt = [str(i) for i in range(N_BITS)]
 
     def setup_ui(self):
         dpg.create_context()
@@ -154,10 +305,10 @@ class QuantumDashboard:
                     dpg.add_input_int(label="Muestras (K)", tag="k_val", default_value=300)
                     dpg.add_input_float(label="Ruido Fijo (T)", tag="t_val", default_value=0.20, format="%.2f")
                     dpg.add_spacer(height=5)
-                    dpg.add_checkbox(label="Simulated Annealing", tag="anneal_active", default_value=False)
+                    dpg.add_checkbox(label="Simulated Annealing", tag="anneal_active", default_value=False, callback=self.on_anneal_changed)
                     with dpg.group(horizontal=True):
-                        dpg.add_input_float(label="T Ini", tag="t_start", default_value=0.35, width=80, format="%.2f")
-                        dpg.add_input_float(label="T Fin", tag="t_end", default_value=0.05, width=80, format="%.2f")
+                        dpg.add_input_float(label="T Ini", tag="t_start", default_value=0.35, width=80, format="%.2f", callback=self.on_anneal_changed)
+                        dpg.add_input_float(label="T Fin", tag="t_end", default_value=0.05, width=80, format="%.2f", callback=self.on_anneal_changed)
                     dpg.add_spacer(height=10)
                     with dpg.group(horizontal=True):
                         dpg.add_button(label="CONECTAR / INICIAR", callback=self.on_start, width=150)
@@ -224,11 +375,11 @@ class QuantumDashboard:
                         dpg.add_text("LEYENDA:", color=(150, 150, 150))
                         with dpg.group(horizontal=True):
                             with dpg.drawlist(width=20, height=20): 
-                                dpg.draw_circle((10, 10), 8, color=(255, 100, 100), fill=(255, 100, 100))
+                                dpg.draw_circle((10, 10), 8, color=NODE_FILL[0], fill=NODE_FILL[0])
                             dpg.add_text("Grupo A")
                             dpg.add_spacer(width=20)
                             with dpg.drawlist(width=20, height=20): 
-                                dpg.draw_circle((10, 10), 8, color=(100, 255, 200), fill=(100, 255, 200))
+                                dpg.draw_circle((10, 10), 8, color=NODE_FILL[1], fill=NODE_FILL[1])
                             dpg.add_text("Grupo B")
 
                     dpg.add_spacer(height=5)
@@ -246,39 +397,62 @@ class QuantumDashboard:
     # --- Callbacks ---
     def on_start(self):
         if self.running: return
+        # A finished batch may still hold the previous reader and port
+        self._stop_reader()
         
         port = dpg.get_value("port_val")
         k = dpg.get_value("k_val")
         t = dpg.get_value("t_val")
         
-        try:
-            self.ser = serial.Serial(port, BAUD_RATE, timeout=0.01)
-            time.sleep(0.5)
-            self.ser.reset_input_buffer()
-            
-            self.ser.write(b"@HELLO\n")
-            time.sleep(0.05)
-            
-            # Use initial T from GUI
-            t_start = dpg.get_value("t_start") if dpg.get_value("anneal_active") else dpg.get_value("t_val")
-            self.last_sent_t = t_start
-            
-            self.ser.write(f"@PARAM N={t_start:.2f} B={PARAM_B} K={PARAM_KP} M={PARAM_M}\n".encode())
-            time.sleep(0.05)
-            self.ser.write(f"@GET K={k} STRIDE={BATCH_STRIDE} BURN={BATCH_BURN}\n".encode())
-            
-            self.running = True
-            self.batch_k = k
-            dpg.set_value("ui_status", f"Conectado a {port}. Recibiendo...")
-        except Exception as e:
-            dpg.set_value("ui_status", f"Error de conexión: {e}")
+        # Use initial T from GUI
+        t_start = dpg.get_value("t_start") if dpg.get_value("anneal_active") else dpg.get_value("t_val")
+        self.last_sent_t = t_start
+        
+        # Whole handshake in one write: the Master buffers its UART and parses line by line
+        handshake = (f"@HELLO\n"
+                     f"@PARAM N={t_start:.2f} B={PARAM_B} K={PARAM_KP} M={PARAM_M}\n"
+                     f"@GET K={k} STRIDE={BATCH_STRIDE} BURN={BATCH_BURN}\n").encode()
+        
+        self.batch_k = k
+        self.on_anneal_changed()
+        
+        # Fresh results for this parameter point; earlier ones stay in self.runs
+        label = (f"T={self.t_start:.2f}->{self.t_end:.2f}" if self.anneal_active
+                 else f"T={t:.2f}")
+        self.acc = BatchAccumulator(k, label)
+        self.runs.append(self.acc)
+        self._reset_batch_view()
+        
+        # Opening the port (and waiting for the ESP32 reset) happens on the reader thread
+        self._q = queue.SimpleQueue()
+        self._rx_stop = threading.Event()
+        self._rx_thr = threading.Thread(target=self._connect_and_read,
+                                        args=(port, handshake, self._q, self._rx_stop), daemon=True)
+        self.running = True
+        dpg.set_value("ui_status", f"Conectando a {port}...")
+        self._rx_thr.start()
+
+    def on_anneal_changed(self):
+        """Cachea los parámetros de annealing para no consultar la UI en cada muestra."""
+        self.anneal_active = dpg.get_value("anneal_active")
+        self.t_start = dpg.get_value("t_start")
+        self.t_end = dpg.get_value("t_end")
+        self.t_slope = (self.t_end - self.t_start) / self.batch_k if self.batch_k > 0 else 0.0
 
     def on_stop(self):
         self.running = False
+        self._stop_reader()
+        dpg.set_value("ui_status", "Captura detenida.")
+
+    def _stop_reader(self):
+        """Detiene el hilo lector y cierra el puerto, si siguen activos."""
+        if self._rx_thr:
+            self._rx_stop.set()
+            self._rx_thr.join(timeout=1.0)
+            self._rx_thr = None
         if self.ser:
             self.ser.close()
             self.ser = None
-        dpg.set_value("ui_status", "Captura detenida.")
 
     def on_restart(self):
         """Reinicia la muestra actual limpiando datos y enviando comando de inicio."""
@@ -289,117 +463,166 @@ class QuantumDashboard:
         dpg.set_value("ui_status", "Muestra reiniciada.")
 
     def on_clear(self):
-        self.all_scores = []
-        self.all_samples = []
-        self.best_history_x = []
-        self.best_history_y = []
-        self.best_score = 0
-        self.best_bits = None
-        self.sample_count = 0
-        self.tick_buffer = {}
+        self.acc = BatchAccumulator(self.batch_k)
+        self.runs = []
+        self._reset_batch_view()
+        dpg.set_value("ui_progress_text", "0 / 300")
+
+    def _reset_batch_view(self):
+        """Vacía el buffer de ticks y las métricas mostradas para empezar un batch nuevo."""
+        self.tb_seen[:] = 0
+        self.tb_tick[:] = -1
+        self._last_ui_count = 0
+        self._graph_dirty = True
         
         dpg.set_value("ui_best_score", "0 / 16")
         dpg.set_value("ui_efficiency", "0.0%")
-        dpg.set_value("ui_progress_text", "0 / 300")
         dpg.set_value("ui_progress_bar", 0)
         dpg.set_value("ui_bits", "----------------")
         dpg.set_value("series_evo", [[], []])
         dpg.set_value("series_hist", [[], []])
 
     def on_save(self):
-        if not self.all_samples: return
+        if not self.acc.sample_count: return
         ts = get_timestamp()
         path = os.path.join(get_script_dir(), f"maxcut_V2_{ts}.csv")
-        with open(path, 'w') as f:
-            f.write("tick,score,bits\n")
-            for s in self.all_samples:
-                f.write(f"{s['tick']},{s['score']},{s['bits']}\n")
-        dpg.set_value("ui_status", f"Guardado en: {os.path.basename(path)}")
+        self.acc.save_csv(path)
+        dpg.set_value("ui_status", f"Guardado en: {os.path.basename(path)} ({self.acc.label})")
+
+    # --- Serial Reader Thread ---
+    def _connect_and_read(self, port, handshake, q, stop):
+        """Abre el puerto, envía el handshake y queda leyendo hasta que se pida detener."""
+        ser = None
+        try:
+            ser = serial.Serial(port, BAUD_RATE, timeout=0.05)
+            time.sleep(0.5)  # the ESP32 resets when the port opens
+            # Stopped (or restarted) while waiting: don't start a batch nobody reads
+            if stop.is_set():
+                ser.close()
+                return
+            ser.reset_input_buffer()
+            ser.write(handshake)
+        except Exception as e:
+            if ser: ser.close()
+            # Only report if this is still the active capture, not one already replaced
+            if stop is self._rx_stop:
+                self.running = False
+                dpg.set_value("ui_status", f"Error de conexión: {e}")
+            return
+        
+        self.ser = ser
+        dpg.set_value("ui_status", f"Conectado a {port}. Recibiendo...")
+        self._rx_loop(ser, q, stop)
+        ser.close()
+
+    def _rx_loop(self, ser, q, stop):
+        """Lee el puerto en segundo plano y encola muestras (tick, sidx, bmask) o mensajes."""
+        rxbuf = bytearray()
+        while not stop.is_set():
+            try:
+                rxbuf += read_available(ser)
+            except Exception as e:
+                # Unplugged or port error: end the capture visibly instead of hanging
+                if stop is self._rx_stop:
+                    self.running = False
+                    dpg.set_value("ui_status", f"Error de lectura: {e}")
+                break
+            *lines, rxbuf = rxbuf.split(b"\n")
+            
+            for raw in lines:
+                if raw.startswith(b"O,"):
+                    # Matched straight from bytes: int() accepts ASCII digits, no decode needed
+                    m = O_LINE_RE.match(raw)
+                    if m is not None:
+                        q.put((int(m[1]), int(m[2]), int(m[3]) & ((1 << BITS_PER_SLAVE) - 1)))
+                    continue
+                
+                # Only the rare control/debug lines are decoded
+                line = raw.decode("utf-8", errors="ignore").strip()
+                if line:
+                    q.put(line)
 
     # --- Main Loop Logic ---
     def update(self):
         if not self.running or not self.ser: return
         
-        # Read incoming lines
-        while self.ser.in_waiting > 0:
+        # Drain whatever the reader thread has parsed since the last frame
+        while True:
             try:
-                line = self.ser.readline().decode("utf-8", errors="ignore").strip()
-            except: continue
-            
-            if line.startswith("@DONE"):
-                self.running = False
-                dpg.set_value("ui_status", "✓ Batch finalizado exitosamente.")
+                item = self._q.get_nowait()
+            except queue.Empty:
                 break
+            
+            if isinstance(item, str):
+                if item.startswith("@DONE"):
+                    self.running = False
+                    self._rx_stop.set()  # the reader exits and closes its port
+                    dpg.set_value("ui_status", "✓ Batch finalizado exitosamente.")
+                    break
+                continue
+            
+            tick, sidx, bmask = item
+            try:
+                if not 0 <= sidx < NUM_SLAVES:
+                    continue
                 
-            if line.startswith("O,"):
-                parts = line.split(",")
-                if len(parts) >= 7:
-                    try:
-                        tick = int(parts[1])
-                        sidx = int(parts[2])
-                        bmask = int(parts[3])
-                        
-                        if tick not in self.tick_buffer:
-                            self.tick_buffer[tick] = {}
-                        self.tick_buffer[tick][sidx] = bmask
-                        
-                        if len(self.tick_buffer[tick]) >= NUM_SLAVES:
-                            # Full sample collected
-                            vec = [bits_from_bmask(self.tick_buffer[tick][s]) 
-                                  for s in range(NUM_SLAVES) if s in self.tick_buffer[tick]]
-                            
-                            if len(vec) == NUM_SLAVES:
-                                bits = np.concatenate(vec)
-                                score = maxcut_score(bits, EDGES)
-                                bitstr = "".join(str(int(x)) for x in bits)
-                                
-                                self.all_scores.append(score)
-                                self.sample_count += 1
-                                self.all_samples.append({'tick': tick, 'score': score, 'bits': bitstr})
-                                
-                                if score > self.best_score:
-                                    self.best_score = score
-                                    self.best_bits = bitstr
-                                    dpg.set_value("ui_best_score", f"{score:.0f} / {N_BITS}")
-                                    dpg.set_value("ui_efficiency", f"{100*score/N_BITS:.1f}%")
-                                    dpg.set_value("ui_bits", bitstr)
-                                
-                                self.best_history_x.append(tick)
-                                self.best_history_y.append(self.best_score)
-                                
-                            # Cleanup old buffers
-                            if len(self.tick_buffer) > 50:
-                                for old in sorted(self.tick_buffer.keys())[:-20]:
-                                    self.tick_buffer.pop(old, None)
-                                    
-                        # ANNEALING LOGIC
-                        if dpg.get_value("anneal_active"):
-                            t_start = dpg.get_value("t_start")
-                            t_end = dpg.get_value("t_end")
-                            progress = self.sample_count / self.batch_k if self.batch_k > 0 else 0
-                            current_t = t_start + (t_end - t_start) * progress
-                            
-                            if abs(current_t - self.last_sent_t) >= 0.01:
-                                self.ser.write(f"@PARAM N={current_t:.2f} B={PARAM_B} K={PARAM_KP} M={PARAM_M}\n".encode())
-                                self.last_sent_t = current_t
-                                # No print to avoid flooding, but we could update status
-                    except: pass
-
-        # Smooth UI update
-        dpg.set_value("ui_progress_text", f"{self.sample_count} / {self.batch_k}")
-        dpg.set_value("ui_progress_bar", self.sample_count / self.batch_k if self.batch_k > 0 else 0)
+                slot = tick % TICK_RING
+                if self.tb_tick[slot] != tick:
+                    self.tb_tick[slot] = tick
+                    self.tb_seen[slot] = 0
+                self.tb_bmask[slot, sidx] = bmask
+                self.tb_seen[slot] |= 1 << sidx
+                
+                if self.tb_seen[slot] == ALL_SLAVES_SEEN:
+                    # Full sample collected
+                    bmasks = self.tb_bmask[slot].tolist()
+                    full = pack_bmasks(bmasks, BITS_PER_SLAVE)
+                    if GRAPH_TYPE == "ring":
+                        score = float(ring_cut(full, N_BITS))
+                    elif NUMBA_OK:
+                        score = process_tick(self.tb_bmask[slot], EDGES_I, EDGES_J, EDGES_W,
+                                             self.bits_buf, BITS_PER_SLAVE)
+                    else:
+                        score = float(self._score_fn(full))
+                    
+                    if self.acc.add(tick, score, self.tb_bmask[slot]):
+                        bitstr = format(full, f"0{N_BITS}b")[::-1]
+                        self._graph_dirty = True
+                        dpg.set_value("ui_best_score", f"{score:.0f} / {N_BITS}")
+                        dpg.set_value("ui_efficiency", f"{100*score/N_BITS:.1f}%")
+                        dpg.set_value("ui_bits", bitstr)
+                
+                # ANNEALING LOGIC
+                if self.anneal_active:
+                    current_t = self.t_start + self.t_slope * self.acc.sample_count
+                    
+                    if abs(current_t - self.last_sent_t) >= 0.01:
+                        self.ser.write(f"@PARAM N={current_t:.2f} B={PARAM_B} K={PARAM_KP} M={PARAM_M}\n".encode())
+                        self.last_sent_t = current_t
+                        # No print to avoid flooding, but we could update status
+            except: pass
+
+        # Smooth UI update, capped at ~30 Hz (always flushed when the batch ends)
+        now = time.monotonic()
+        if self.running and now - self._last_ui_ts < UI_REFRESH_S: return
+        self._last_ui_ts = now
         
-        if self.sample_count % 5 == 0 and self.sample_count > 0:
-            dpg.set_value("series_evo", [self.best_history_x, self.best_history_y])
+        acc = self.acc
+        dpg.set_value("ui_progress_text", f"{acc.sample_count} / {self.batch_k}")
+        dpg.set_value("ui_progress_bar", acc.sample_count / self.batch_k if self.batch_k > 0 else 0)
+        
+        if acc.sample_count > 0 and acc.sample_count != self._last_ui_count:
+            self._last_ui_count = acc.sample_count
+            dpg.set_value("series_evo", [acc.best_history_x, acc.best_history_y])
             dpg.fit_axis_data("x_axis_evo")
             dpg.fit_axis_data("y_axis_evo")
             
-            hist, edges = np.histogram(self.all_scores, bins=min(10, len(set(self.all_scores)) or 1))
-            centers = (edges[:-1] + edges[1:]) / 2
-            dpg.set_value("series_hist", [centers.tolist(), hist.tolist()])
+            dpg.set_value("series_hist", [SCORE_BINS, acc.score_counts.tolist()])
             dpg.fit_axis_data("x_axis_hist")
             dpg.fit_axis_data("y_axis_hist")
-            
+        
+        if self._graph_dirty:
+            self._graph_dirty = False
             self.draw_graph()
 
     def draw_graph(self):
@@ -408,27 +631,23 @@ class QuantumDashboard:
         
         dpg.delete_item("graph_drawlist", children_only=True)
         
-        # 1. Draw Edges
-        for (i, j, w) in EDGES:
-            p1 = self.node_positions[i]
-            p2 = self.node_positions[j]
-            # If nodes are in different groups, highlight edge
-            is_cut = False
-            if self.best_bits and self.best_bits[i] != self.best_bits[j]:
-                is_cut = True
-            
-            color = (255, 255, 255, 100) if is_cut else (50, 50, 50, 100)
-            thickness = 2 if is_cut else 1
+        best_bits = self.acc.best_bits
+        if best_bits is not None:
+            cuts = (best_bits[EDGES_I] ^ best_bits[EDGES_J]).tolist()
+            groups = best_bits.tolist()
+        else:
+            cuts = [0] * len(EDGES)
+            groups = [0] * N_BITS
+        
+        # 1. Draw Edges (highlighted when the nodes are in different groups)
+        for p1, p2, is_cut in zip(self._edge_p1, self._edge_p2, cuts):
+            color, thickness = EDGE_STYLE[is_cut]
             dpg.draw_line(p1, p2, color=color, thickness=thickness, parent="graph_drawlist")
 
         # 2. Draw Nodes
-        for i, pos in enumerate(self.node_positions):
-            val = int(self.best_bits[i]) if self.best_bits else 0
-            # Colors: Group A (Reddish), Group B (Cyan/Greenish)
-            color = (255, 100, 100) if val == 0 else (100, 255, 200)
-            
-            dpg.draw_circle(pos, self.node_radius, color=(255, 255, 255), fill=color, parent="graph_drawlist")
-            dpg.draw_text((pos[0]-4, pos[1]-7), str(i), size=12, color=(0,0,0), parent="graph_drawlist")
+        for pos, label_pos, label, val in zip(self.node_positions, self._label_pos, self._label_txt, groups):
+            dpg.draw_circle(pos, self.node_radius, color=NODE_OUTLINE, fill=NODE_FILL[val], parent="graph_drawlist")
+            dpg.draw_text(label_pos, label, size=12, color=NODE_LABEL, parent="graph_drawlist")
 
     def run(self):
         self.setup_ui()